@@ -2,12 +2,22 @@ import os
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
-from hypothepy.v1.api import HypoApi
 
 load_dotenv(dotenv_path='./.env')
 HYPOTHESIS_USER=os.getenv("HYPOTHESIS_USER")
 HYPOTHESIS_API_KEY=os.getenv("HYPOTHESIS_API_KEY")
-HYPO = HypoApi(HYPOTHESIS_API_KEY, HYPOTHESIS_USER)
+
+
+def __getattr__(name):
+    # PEP 562: HYPO is constructed lazily on first access so that entry points that never talk
+    # to hypothes.is (e.g. python -m src.biorxiv) do not pay the hypothepy import and setup cost.
+    # 'from . import HYPO' still works.
+    if name == 'HYPO':
+        from hypothepy.v1.api import HypoApi
+        global HYPO
+        HYPO = HypoApi(HYPOTHESIS_API_KEY, HYPOTHESIS_USER)
+        return HYPO
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 logger = logging.getLogger('traxiv logger')
@@ -19,7 +29,7 @@ log_file = Path('traxiv.log')
 if not log_dir.exists():
     log_dir.mkdir()
 log_path = log_dir / log_file
-fh = logging.FileHandler(log_path)
+fh = logging.FileHandler(log_path, delay=True)  # the file is only opened on the first record
 fh.setLevel(logging.INFO)
 fh.setFormatter(formatter)
 logger.addHandler(fh)
@@ -4,14 +4,19 @@ It uses the biorXiv API for publishers: https://api.biorxiv.org/publisher/help
 '''
 
 import argparse
-import requests
+import asyncio
+import aiohttp
+import orjson
 from datetime import date
-import time
 from typing import List
-from .utils import resolve, progress
+from .utils import resolve, progress, RetrySession
 from .toolbox import Preprint
 from . import logger
 
+# transient 429/5xx responses are retried with exponential backoff instead of aborting the crawl,
+# which would force a full re-run from cursor 0
+_SESSION = RetrySession.requests_retry_session(retries=5, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+
 
 def retrieve(prefix:str, start_date:str, end_date:str) -> List[Preprint]:
     """
@@ -42,51 +47,228 @@ def retrieve(prefix:str, start_date:str, end_date:str) -> List[Preprint]:
 
     biorxiv_api = "https://api.biorxiv.org/publisher"
     results = []
-    cursor = 0
-    remaining = 1
-    while remaining > 0:
-        url = "/".join([biorxiv_api, prefix, start_date, end_date, str(cursor)])
-        logger.info(f"bioRxiv request: {url}")
-        response = requests.get(url)
-        if response.status_code == 200:
-            response = response.json()
-            message = response['messages'][0]
-            if message['status'] == 'ok':
-                count = int(message['count'])
-                total = int(message['total'])
-                logger.info(f"response received ({count} preprints)")
-                cursor += count
-                remaining = total - count
-                results += [Preprint(**j) for j in response['collection']]
-            else:
-                remaining = 0
-        else:
-            logger.error(f"⚠️ Problem with bioRxiv api, status_code={response.status_code}")
-            remaining = 0
-        time.sleep(0.1)
+    base = f"{biorxiv_api}/{prefix}/{start_date}/{end_date}"
+    url = f"{base}/0"
+    logger.info("bioRxiv request: %s", url)
+    response = _SESSION.get(url, timeout=30)
+    if response.status_code != 200:
+        logger.error("⚠️ Problem with bioRxiv api, status_code=%s", response.status_code)
+        return results
+    response = orjson.loads(response.content)  # collections can be large; orjson parses them several times faster than stdlib json
+    message = response['messages'][0]
+    if message['status'] != 'ok':
+        return results
+    count = int(message['count'])
+    total = int(message['total'])
+    logger.info("response received (%s of %s preprints)", count, total)
+    results.extend(Preprint._from_api(j) for j in response['collection'])
+    # once the first page has revealed total and the page size, the remaining cursor
+    # offsets are all known and independent, so they can be fetched concurrently
+    offsets = list(range(count, total, count)) if count else []
+    if offsets:
+        collections = asyncio.run(_fetch_pages(biorxiv_api, prefix, start_date, end_date, offsets))
+        for collection in collections:
+            results.extend(Preprint._from_api(j) for j in collection)
     return results
 
-def details(preprints: List[Preprint]) -> List[Preprint]:
+
+async def _fetch_pages(biorxiv_api: str, prefix: str, start_date: str, end_date: str, offsets: List[int]) -> List[List]:
+    """
+    Fetches the remaining pages of a publisher API query concurrently.
+    The collections are returned in offset order so that the caller can concatenate them deterministically.
+
+    Arguments:
+        biorxiv_api (str): the base url of the bioRxiv publisher API.
+        prefix (str): the doi prefix of the publisher.
+        start_date (str): the start date (format YYYY-MM-DD) of the range.
+        end_date (str): the end date (format YYYY-MM-DD) of the range.
+        offsets (List[int]): the cursor offsets of the pages still to be fetched.
+
+    Returns:
+        List of 'collection' arrays, one per offset.
+    """
+
+    sem = asyncio.Semaphore(4)
+    base = f"{biorxiv_api}/{prefix}/{start_date}/{end_date}"  # invariant across pages, built once
+
+    async def fetch(session: aiohttp.ClientSession, cursor: int) -> List:
+        url = f"{base}/{cursor}"
+        logger.info("bioRxiv request: %s", url)
+        async with sem:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    data = orjson.loads(await response.read())
+                    if data['messages'][0]['status'] == 'ok':
+                        return data['collection']
+                else:
+                    logger.error("⚠️ Problem with bioRxiv api, status_code=%s", response.status)
+        return []
+
+    async with aiohttp.ClientSession(headers={"User-Agent": "traxiv/1.0"}) as session:
+        return await asyncio.gather(*[fetch(session, cursor) for cursor in offsets])
+
+async def _get_json(session: aiohttp.ClientSession, url: str, retry: bool=True):
+    """
+    Fetches a json response from the bioRxiv API.
+    A 429 response is retried once after honouring the Retry-After header.
+
+    Arguments:
+        session (aiohttp.ClientSession): the shared client session.
+        url (str): the url to fetch.
+        retry (bool): whether a 429 response may still be retried.
+
+    Returns:
+        the parsed json response, or None if the request failed.
+    """
+
+    async with session.get(url) as response:
+        if response.status == 429 and retry:  # backing off as instructed before trying once more
+            retry_after = int(response.headers.get('Retry-After', '1'))
+            await asyncio.sleep(retry_after)
+        elif response.status == 200:
+            return orjson.loads(await response.read())
+        else:
+            logger.error("⚠️ Problem with bioRxiv api, status=%s", response.status)
+            return None
+    return await _get_json(session, url, retry=False)
+
+
+def _fill_details(p: Preprint, data, url: str):
+    """
+    Updates a preprint in place with the corresponding author and institution from a details API response.
+    """
+
+    if data is not None:
+        if data.get('collection'):
+            first_match = data.get('collection')[0]
+            p.corr_author = first_match.get('author_corresponding')
+            p.institution = first_match.get('author_corresponding_institution')
+        else:
+            logger.warning("%s did not retrieve any preprint!", url)
+            p.corr_author = ""
+            p.institution = ""
+
+
+async def details_async(preprints: List[Preprint]) -> List[Preprint]:
+    """
+    Completes preprints with the corresponding author and institution retrieved from the bioRxiv details API.
+    The detail requests are independent of each other, so they are issued concurrently with aiohttp.
+    A semaphore keeps the number of requests in flight bounded to stay polite with the API.
+
+    Arguments:
+        preprints (List[Preprint]): the preprints to be completed.
+
+    Returns:
+        List of Preprints updated with corr_author and institution.
+    """
+
     biorxiv_details_api = "https://api.biorxiv.org/detail"
     N = len(preprints)
-    for i, p in enumerate(preprints):
-        doi = p.biorxiv_doi
-        url = "/".join([biorxiv_details_api, doi])
-        progress(i, N, f"{url}")
-        response = requests.get(url)
-        if response.status_code == 200:
-            response = response.json()
-            if response.get('collection'):
-                first_match = response.get('collection')[0]
-                p.corr_author = first_match.get('author_corresponding')
-                p.institution = first_match.get('author_corresponding_institution')
-            else:
-                logger.warning(f"{url} did not retrieve any preprint!")
-                p.corr_author = ""
-                p.institution = ""
+    sem = asyncio.Semaphore(8)
+    done = 0
+
+    async def fetch_one(session: aiohttp.ClientSession, p: Preprint):
+        nonlocal done
+        url = f"{biorxiv_details_api}/{p.biorxiv_doi}"
+        async with sem:
+            data = await _get_json(session, url)
+        _fill_details(p, data, url)
+        done += 1
+        progress(done - 1, N, url)
+
+    async with aiohttp.ClientSession(headers={"User-Agent": "traxiv/1.0"}) as session:
+        await asyncio.gather(*[fetch_one(session, p) for p in preprints])
     return preprints # not really needed since mutable
 
 
+def details(preprints: List[Preprint]) -> List[Preprint]:
+    """
+    Synchronous wrapper around details_async() so that callers do not need to deal with the event loop.
+    """
+
+    return asyncio.run(details_async(preprints))
+
+
+async def _retrieve_with_details_async(prefix: str, start_date: str, end_date: str) -> List[Preprint]:
+    """
+    Pipelines publisher API paging with detail fetching.
+    A producer pages the publisher API and puts each new Preprint on a queue; a pool of consumers
+    drains the queue and hits the details API. The two network phases therefore overlap instead of
+    running back to back. Results are concatenated in cursor order to stay deterministic.
+
+    Arguments:
+        prefix (str): the doi prefix of the publisher.
+        start_date (str): the start date (format YYYY-MM-DD) of the range.
+        end_date (str): the end date (format YYYY-MM-DD) of the range.
+
+    Returns:
+        List of Preprints, completed with corr_author and institution.
+    """
+
+    biorxiv_api = "https://api.biorxiv.org/publisher"
+    biorxiv_details_api = "https://api.biorxiv.org/detail"
+    queue = asyncio.Queue()
+    pages = {}  # cursor -> List[Preprint], to concatenate deterministically at the end
+    page_sem = asyncio.Semaphore(4)
+    detail_sem = asyncio.Semaphore(8)
+    n_consumers = 8
+
+    async with aiohttp.ClientSession(headers={"User-Agent": "traxiv/1.0"}) as session:
+
+        base = f"{biorxiv_api}/{prefix}/{start_date}/{end_date}"
+
+        async def produce_page(cursor: int):
+            url = f"{base}/{cursor}"
+            logger.info("bioRxiv request: %s", url)
+            async with page_sem:
+                data = await _get_json(session, url)
+            if data is None:
+                return 0, 0
+            message = data['messages'][0]
+            if message['status'] != 'ok':
+                return 0, 0
+            preprints = [Preprint._from_api(j) for j in data['collection']]
+            pages[cursor] = preprints
+            for p in preprints:
+                await queue.put(p)
+            return int(message['count']), int(message['total'])
+
+        async def consumer():
+            while True:
+                p = await queue.get()
+                if p is None:  # sentinel: the producer is done
+                    queue.task_done()
+                    break
+                url = f"{biorxiv_details_api}/{p.biorxiv_doi}"
+                async with detail_sem:
+                    data = await _get_json(session, url)
+                _fill_details(p, data, url)
+                queue.task_done()
+
+        consumers = [asyncio.create_task(consumer()) for _ in range(n_consumers)]
+        count, total = await produce_page(0)
+        logger.info("response received (%s of %s preprints)", count, total)
+        if count:
+            await asyncio.gather(*[produce_page(cursor) for cursor in range(count, total, count)])
+        for _ in consumers:
+            await queue.put(None)
+        await asyncio.gather(*consumers)
+
+    results = []
+    for cursor in sorted(pages):
+        results += pages[cursor]
+    return results
+
+
+def retrieve_with_details(prefix: str, start_date: str, end_date: str) -> List[Preprint]:
+    """
+    Synchronous wrapper around _retrieve_with_details_async().
+    Equivalent to details(retrieve(...)) but with the two phases pipelined.
+    """
+
+    return asyncio.run(_retrieve_with_details_async(prefix, start_date, end_date))
+
+
 def main():
     parser = argparse.ArgumentParser( description="Retrieves bioRxiv preprint for journal", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument('prefix', nargs="?", default="10.15252", help="The prefix of the publisher.")
@@ -99,8 +281,7 @@ def main():
     end = args.end
     delimiter = args.delimiter
 
-    results = retrieve(prefix, start, end)
-    results = details(results)
+    results = retrieve_with_details(prefix, start, end)
 
     header = delimiter.join(["biorxiv_doi", "published_doi", "category", "corr_author", "institution"])
     print(header)
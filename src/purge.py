@@ -4,17 +4,20 @@ Removes all the hypothes.is posts linked to a user and group and purges the coll
 
 import argparse
 import os
+from concurrent.futures import ThreadPoolExecutor
 from . import HYPO, HYPOTHESIS_USER
 from .utils import progress, get_groupid
 
 
-def purge(user, groupid: str, limit: int):
+def purge(user, groupid: str, limit: int, workers: int=5):
     """
     A simple function to remove posts in a specific group. The posts are also removed from the MongoDB database.
+    Each deletion is an independent round-trip to hypothes.is, so they are issued from a bounded thread pool.
 
     Arguments:
         groupid (str): the is of the hypothes.is group
         limit (int): the maximum number of posts to be deleted
+        workers (int): the number of concurrent deletion requests
     """
 
     response = HYPO.annotations.search(user=user, group=groupid, limit=limit)
@@ -24,12 +27,12 @@ def purge(user, groupid: str, limit: int):
     print(f'deleting {total} posts from {groupid} of {user}')
     delete_count = 0
     N = len(documents)
-    for i, d in enumerate(documents):
-        id = d['id']
-        progress(i, N, f"{id}  ")
-        response = HYPO.annotations.delete(id)
-        if response.status_code == 200:
-            delete_count += 1
+    ids = [d['id'] for d in documents]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i, (id, response) in enumerate(zip(ids, executor.map(HYPO.annotations.delete, ids))):
+            progress(i, N, id + "  ")
+            if response.status_code == 200:
+                delete_count += 1
     print(f"Purged {delete_count} records from {groupid}")
     print(f"{total - delete_count} remaining")
 
@@ -38,13 +41,15 @@ def main():
     parser = argparse.ArgumentParser( description="Removes posts and purges the database", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument('group', default='', help='Name of the hypothesis group')
     parser.add_argument('--limit', default=200, help='Maximum number deleted.')
+    parser.add_argument('--workers', default=5, type=int, help='Number of concurrent deletion requests.')
 
     args = parser.parse_args()
     group_name = args.group
     limit = args.limit
+    workers = args.workers
     groupid = get_groupid(group_name, document_uri="https://www.biorxiv.org") # important to add uri to retrieve public groups!
     if groupid:
-        purge(HYPOTHESIS_USER, groupid, limit=limit)
+        purge(HYPOTHESIS_USER, groupid, limit=limit, workers=workers)
     else:
         print(f"Could not find group: {group_name}")
 
@@ -7,10 +7,28 @@ Usage:
     url =  generate_rpf_link('Molecular Systems Biology', '10.15252/msb.20198849')
 """
 
+import functools
 import requests
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
 import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
 from .utils import resolve
 
+# a single pooled session so that successive link tests against the same hosts reuse keep-alive connections
+# responses are cached on disk for a week so that reruns over the same dois skip the network entirely
+_cache_dir = Path('./cache')
+if not _cache_dir.exists():
+    _cache_dir.mkdir()
+_SESSION = CachedSession(str(_cache_dir / 'rpf'), backend="sqlite", expire_after=7*86400)
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# compiled once at import so that batch link generation does not pay the re cache lookup per doi
+_SUFFIX_RE = re.compile(r'^10\.\d{4,9}/([-_;()/:a-zA-Z0-9]+)\.([-_;()/:a-zA-Z0-9]+)$')
+_LSA_RE = re.compile(r'\d+/\d+/e\d+')
+
 
 class RPFLinkAbstract:
     """
@@ -36,8 +54,29 @@ class RPFLinkAbstract:
     def _generate_link(self, doi: str) -> str:
         raise NotImplementedError
 
+    def _test(self, link: str) -> bool:
+        """
+        Checks that a candidate RPF link is alive and points to a pdf.
+        A HEAD request is used so that the pdf body itself is never downloaded.
+
+        Arguments:
+            link (str): the url of the candidate RPF link.
+
+        Returns:
+            bool: whether the link resolves to a pdf.
+        """
+
+        try:
+            response = _SESSION.head(link, allow_redirects=True, timeout=10)
+        except requests.RequestException:
+            return False
+        return response.status_code == 200 and response.headers.get("Content-Type", "").startswith("application/pdf")
+
     def __call__(self, doi: str) -> str:
-        return self._generate_link(doi)
+        link = self._generate_link(doi)
+        if link and not self._test(link):
+            link = ""
+        return link
 
 
 class RPFLinkEjErEmmMsb(RPFLinkAbstract):
@@ -46,7 +85,9 @@ class RPFLinkEjErEmmMsb(RPFLinkAbstract):
     """
 
     def _generate_link(self, doi: str) -> str:
-        suffix_without_dot = re.sub(r'^10.\d{4,9}/([-_;()/:a-zA-Z0-9]+)\.([-_;()/:a-zA-Z0-9]+)$', r'\1\2', doi)
+        if not _SUFFIX_RE.match(doi):  # a doi that does not match would leave re.sub a no-op and produce a garbage url
+            return ""
+        suffix_without_dot = _SUFFIX_RE.sub(r'\1\2', doi)
         link = f"https://www.embopress.org/action/downloadSupplement?doi={doi}&file={suffix_without_dot}.reviewer_comments.pdf"
         return link
 
@@ -68,11 +109,34 @@ class RPFLinkLSA(RPFLinkAbstract):
     """
     def _generate_link(self, doi: str) -> str:
         resolved = resolve(doi)
-        vol_issue_enumber = re.search(r'\d+/\d+/e\d+', resolved).group(0)
-        link = f"https://www.life-science-alliance.org/content/lsa/{vol_issue_enumber}.reviewer-comments.pdf"
+        m = _LSA_RE.search(resolved)
+        if m is None:  # the doi did not resolve or points somewhere unexpected; nothing worth probing
+            return ""
+        link = f"https://www.life-science-alliance.org/content/lsa/{m.group(0)}.reviewer-comments.pdf"
         return link
 
 
+@functools.lru_cache(maxsize=8)
+def _resolver_for(journal: str) -> RPFLinkAbstract:
+    """
+    Maps a (normalized) journal name to its link generator.
+    The generators are stateless, so one instance per journal is enough; the mapping is memoized
+    so batch callers do not redo the name comparisons and instantiation per paper.
+
+    Arguments:
+        journal (str): the name of the journal, stripped and lowercased.
+
+    Returns:
+        RPFLinkAbstract: the link generator, or None for journals without RPFs.
+    """
+
+    if journal in ['the embo journal', 'embo reports', 'embo molecular medicine', 'molecular systems biology']:
+        return RPFLinkEjErEmmMsb()
+    elif journal == 'life science alliance':
+        return RPFLinkLSA()
+    return None
+
+
 def generate_rpf_link(journal: str, doi: str) -> str:
     """
     Resolves an EMBO Press journal and doi into a link to the Review Process Files (RPF).
@@ -85,11 +149,25 @@ def generate_rpf_link(journal: str, doi: str) -> str:
         str: the url of the link to the rpf
     """
 
-    journal = journal.strip().lower()
-    if journal in ['the embo journal', 'embo reports', 'embo molecular medicine', 'molecular systems biology']:
-        resolver = RPFLinkEjErEmmMsb()
-    elif journal == 'life science alliance':
-        resolver = RPFLinkLSA()
-    else:
+    resolver = _resolver_for(journal.strip().lower())
+    if resolver is None:
         return ""
-    return resolver(doi)
\ No newline at end of file
+    return resolver(doi)
+
+
+def generate_rpf_links(pairs: List[Tuple[str, str]], workers: int=8) -> List[str]:
+    """
+    Generates and tests RPF links for a batch of papers.
+    Each link involves one or two synchronous HTTP calls, so the batch is fanned out over a thread
+    pool; the threads share the module-level pooled session, so there is no per-thread TLS cost.
+
+    Arguments:
+        pairs (List[Tuple[str, str]]): (journal, doi) pairs, as accepted by generate_rpf_link().
+        workers (int): the number of concurrent link generations.
+
+    Returns:
+        List of urls (or empty strings), in the same order as the input pairs.
+    """
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda pair: generate_rpf_link(*pair), pairs))
\ No newline at end of file
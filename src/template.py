@@ -2,6 +2,7 @@
 This module makes available the template and links needed to generate hypothes.is posts by traxiv.
 """
 
+import re
 from string import Template
 
 banners = {}
@@ -14,3 +15,7 @@ banners['Life Science Alliance']     = "https://www.embopress.org/pb-assets/embo
 with open('./templates/embo_press.md') as f:
     template_string = f.read()
     embo_press_template = Template(template_string)
+    # the same template translated once, at import, into a str.format-style string:
+    # format_map substitutes placeholders with a C-level dict lookup instead of
+    # Template.substitute's regex walk on every call
+    embo_press_format = re.sub(r'\$\{?(\w+)\}?', r'{\1}', template_string.replace('{', '{{').replace('}', '}}'))
@@ -2,26 +2,35 @@
 A set of classes and functions used to manipulate bioRxiv preprints, published papers and hypothes.is posts.
 """
 
+import re
 from typing import List, Dict
-from . import HYPO
 from hypothepy.v1.helpers import PermissionsHelper
-from .utils import info
+from .utils import info, info_batch
+
+# a doi as it appears inside an annotation uri, either as 'doi:10.1101/...' or embedded
+# in a biorxiv content url such as https://www.biorxiv.org/content/10.1101/605725v1
+_DOI_IN_URI = re.compile(r'10\.\d{4,9}/[0-9.]+')
 
 
 class AsDict:
     """
     Serialize itself recursively to a dictionary with all the attributes.
     It is practical when posting simple objects to MongoDB.
+    Subclasses declare __slots__ with their fields, a class-level _FIELDS tuple listing them
+    (including inherited ones) and a _NESTED frozenset naming the fields that are themselves AsDict
+    objects. This avoids a per-instance __dict__ and the per-value isinstance check during serialization.
     """
 
+    __slots__ = ()
+    _FIELDS: tuple = ()
+    _NESTED: frozenset = frozenset()
+
     def to_dict(self) -> Dict:
         """
         Returns a dictionary with the attribute names as keys and attribute value as values. If a value is itself an object, it is first recursively serialized to a dictionary.
         """
-        d = {}
-        for k, v in self.__dict__.items():
-           d[k] = v.to_dict() if isinstance(v, AsDict) else v
-        return d
+        cls = type(self)
+        return {k: (getattr(self, k).to_dict() if k in cls._NESTED else getattr(self, k)) for k in cls._FIELDS}
 
 class Preprint(AsDict):
     """
@@ -37,6 +46,20 @@ class Preprint(AsDict):
         published_citation_count: the number of citations; unclear whether it is to the paper or preprint and what is the source of the data
     """
 
+    __slots__ = (
+        'biorxiv_doi',
+        'biorxiv_url',
+        'published_doi',
+        'preprint_title',
+        'preprint_category',
+        'preprint_date',
+        'published_date',
+        'published_citation_count',
+        'corr_author',
+        'institution',
+    )
+    _FIELDS = __slots__
+
     def __init__(self,
         biorxiv_doi='',
         biorxiv_url='',
@@ -60,6 +83,31 @@ class Preprint(AsDict):
         self.corr_author = corr_author
         self.institution = institution
 
+    @classmethod
+    def _from_api(cls, j: Dict) -> 'Preprint':
+        """
+        Fast constructor for records coming straight from the bioRxiv API.
+        Writes the slots directly instead of going through keyword unpacking and __init__ dispatch,
+        which adds up when thousands of collection entries are parsed per run.
+
+        Arguments:
+            j (Dict): one item of the 'collection' array returned by the bioRxiv API.
+        """
+
+        obj = object.__new__(cls)
+        g = j.get
+        obj.biorxiv_doi = g('biorxiv_doi', '')
+        obj.biorxiv_url = g('biorxiv_url', '')
+        obj.published_doi = g('published_doi', '')
+        obj.preprint_title = g('preprint_title', '')
+        obj.preprint_category = g('preprint_category', '')
+        obj.preprint_date = g('preprint_date', '')
+        obj.published_date = g('published_date', '')
+        obj.published_citation_count = g('published_citation_count', '')
+        obj.corr_author = g('corr_author', '')
+        obj.institution = g('institution', '')
+        return obj
+
 
 
 class Published(AsDict):
@@ -72,6 +120,9 @@ class Published(AsDict):
         subject (List): the list of subject areas assigned by CrossRef to the journal.
     """
 
+    __slots__ = ('doi', 'journal', 'subject')
+    _FIELDS = __slots__
+
     def __init__(self, doi: str='', journal: str='', subject: List=[]):
         self.doi = doi
         self.journal = journal
@@ -86,12 +137,47 @@ class Published(AsDict):
             doi (str): the DOI of the paper.
         """
 
+        self.from_metadata(doi, info(doi))
+
+    def from_metadata(self, doi: str, crossref_metadata: Dict):
+        """
+        Populates the metadata fields from an already retrieved CrossRef record.
+        Useful when the metadata was fetched in batch or asynchronously by the caller.
+
+        Arguments:
+            doi (str): the DOI of the paper.
+            crossref_metadata (Dict): the json record returned by CrossRef for this doi.
+        """
+
         self.doi: str = doi
-        crossref_metadata = info(self.doi)
-        self.journal: str = crossref_metadata.get('container-title', '')
+        journal = crossref_metadata.get('container-title', '')
+        if isinstance(journal, list):  # the works endpoint returns a list, doi.org content negotiation a string
+            journal = journal[0] if journal else ''
+        self.journal: str = journal
         self.subject: List = []
         self.subject = crossref_metadata.get('subject', '') # seems to be the broad subject of the _journal_ where the paper was published
 
+    @classmethod
+    def bulk_from_dois(cls, dois: List[str]) -> Dict[str, 'Published']:
+        """
+        Retrieves the metadata for many papers at once via utils.info_batch, which queries the
+        CrossRef works endpoint with a multi-doi filter, one request per chunk of dois instead of
+        one round-trip per paper.
+
+        Arguments:
+            dois (List[str]): the DOIs of the papers.
+
+        Returns:
+            Dict: maps each doi (lowercased, as returned by CrossRef) to a populated Published object.
+        """
+
+        papers = {}
+        for doi, item in info_batch(dois).items():
+            paper = cls()
+            paper.from_metadata(doi, item)
+            papers[doi] = paper
+        return papers
+
 class HypoPost(AsDict):
     """
     A hypothes.is post.
@@ -102,6 +188,9 @@ class HypoPost(AsDict):
         hypothesis_id (str): the unique id assigned by hypothes.is when the post is put online.
     """
 
+    __slots__ = ('annotation_text', 'tags', 'hypothesis_id')
+    _FIELDS = __slots__
+
     def __init__(self, annotation_text: str='', hypothesis_id: str='', tags: List=[]):
         self.annotation_text = annotation_text
         self.tags = tags
@@ -152,6 +241,8 @@ def post_one(permissions:PermissionsHelper, groupid:str, target:Target, post:Hyp
     Returns:
         The response from the hypothes.is REST API to the request.
     """
+    from . import HYPO  # deferred so that importing toolbox does not construct the hypothes.is client
+
     highwire = HYPO.helpers.highwire(doi=[target.doi])
     document = HYPO.helpers.documents(title=target.title, highwire=highwire)
     response = HYPO.annotations.create(
@@ -176,6 +267,8 @@ def exists(groupid:str, doi:str) -> bool:
        true if there is already some annotations, false if nothing is found for this doi from this group, None if the request failed
     """
 
+    from . import HYPO
+
     uri = f"doi:{doi}"
     response = HYPO.annotations.search(
         uri=uri,
@@ -187,3 +280,38 @@ def exists(groupid:str, doi:str) -> bool:
     else:
         fount_it = None
     return found_it
+
+
+def exists_many(groupid: str, dois: List[str]) -> set:
+    """
+    Checks for many dois at once whether annotations from a given group already exist.
+    The group's annotations are fetched with one paginated search instead of one search request
+    per doi as exists() does; the doi of each annotation is recovered from its uri.
+
+    Arguments:
+       groupid (str): the groupid of the group who has potentially posted annotations
+       dois (List[str]): the dois (ie '10.01010/123456') to check
+
+    Returns:
+       set of the dois for which annotations already exist, or None if the search failed
+    """
+
+    from . import HYPO
+
+    wanted = set(dois)
+    found = set()
+    limit = 200
+    offset = 0
+    while True:
+        response = HYPO.annotations.search(group=groupid, limit=limit, offset=offset)
+        if response.status_code != 200:
+            return None
+        rows = response.json()['rows']
+        for row in rows:
+            m = _DOI_IN_URI.search(row.get('uri', ''))
+            if m and m.group(0).rstrip('.') in wanted:
+                found.add(m.group(0).rstrip('.'))
+        if len(rows) < limit:
+            break
+        offset += limit
+    return found
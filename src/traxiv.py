@@ -5,39 +5,92 @@ The pre-prepared posts are cached in a MongDB and finally posted in a specific g
 """
 
 import argparse
+import asyncio
+import aiohttp
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 import time
 import re
-from string import Template
 from pprint import pformat
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator
 
 from . import HYPO, HYPOTHESIS_USER
 from .biorxiv import retrieve
 from .rpf import generate_rpf_link
-from .utils import resolve, info, progress, get_groupid, RetrySession
-from .toolbox import Preprint, Published, HypoPost, Target, post_one, exists
-from .template import embo_press_template, banners
+from .utils import resolve, aresolve, info, ainfo, info_batch, progress, get_groupid, RetrySession
+from .toolbox import Preprint, Published, HypoPost, Target, post_one, exists, exists_many
+from .template import embo_press_format, banners
 from . import logger
 
 
+# cheap journal hints derived from the published doi suffix; used to reject obvious
+# non-matches before paying any network call for them
+JOURNAL_HINTS = {
+    'embj': 'The EMBO Journal',
+    'embr': 'EMBO reports',
+    'emmm': 'EMBO Molecular Medicine',
+    'msb': 'Molecular Systems Biology',
+    'lsa': 'Life Science Alliance',
+}
+_HINT_RE = re.compile(r'^10\.\d{4,9}/([a-z]+)')
+
+
+def journal_hint(doi: str) -> str:
+    """
+    Guesses the journal in which a paper appeared from the shape of its doi.
+
+    Arguments:
+        doi (str): the doi of the published paper.
+
+    Returns:
+        str: the name of the journal, or an empty string when the doi carries no known hint.
+    """
+
+    m = _HINT_RE.match(doi.lower())
+    return JOURNAL_HINTS.get(m.group(1), '') if m else ''
+
+
+@functools.lru_cache(maxsize=8)
+def _with_banner(template: str, journal: str) -> str:
+    """
+    Returns the annotation template with the journal's banner already substituted.
+    The banner is invariant per journal, so this is computed once per (template, journal)
+    pair rather than once per preprint.
+    """
+
+    return template.replace('{banner}', banners[journal])
+
+
+@functools.lru_cache(maxsize=1024)
+def _render(template: str, journal: str, rpf_link: str, paper_doi: str) -> str:
+    """
+    Renders the annotation text, memoized so that identical inputs (e.g. the same preprint
+    reprocessed on a later run) skip the substitution entirely.
+    """
+
+    return _with_banner(template, journal).format_map({'rpf_link': rpf_link, 'paper_doi': paper_doi})
+
+
 class HypoPostRPF(HypoPost):
     """
     Extends HypoPost to generate a templated annotation with tags based on the metadata of a paper and preprint.
     """
 
-    def generate(self, preprint:Preprint, paper:Published, template:Template):
+    __slots__ = ()
+
+    def generate(self, preprint:Preprint, paper:Published, template:str):
         """
         Generates the text of the post from a template based on the metadata of the target preprint and the associated published paper.
-        
+
         Arguments:
             preprint (Preprint): the preprint to which the post is going to be linked; only used to retieve a subject category tag.
             paper (Published): the published paper, used to retrieve the link to the review process file (rpf), the journal, the doi of the paper and the link to a banner image
-            template (Template): a simple string.Template object to generate the text of the annotation with appropriate substitution
+            template (str): a str.format-style template to generate the text of the annotation with appropriate substitution
         """
 
-        banner_url = banners[paper.journal]
-        self.annotation_text = template.substitute({'rpf_link': paper.rpf, 'banner': banner_url, 'paper_doi': paper.doi})
+        self.annotation_text = _render(template, paper.journal, paper.rpf, paper.doi)
         self.tags = ['PeerReviewed', 'EMBOPress', paper.journal, preprint.preprint_category]
 
 
@@ -48,18 +101,23 @@ class PublishedWithRPF(Published):
     Arguments:
         rpf (str): url to the downloadable review process file.
     """
+
+    __slots__ = ('rpf',)
+    _FIELDS = Published._FIELDS + __slots__
+
     def __init__(self, rpf: str='', *args, **kwargs):
         super(PublishedWithRPF, self).__init__(*args, **kwargs)
         self.rpf = rpf
 
-    def from_doi(self, doi):
+    def from_metadata(self, doi, crossref_metadata):
         """
-        Extends the parent from_doi() method by creating a link to the review process file from the doi.
+        Extends the parent from_metadata() method by creating a link to the review process file from the doi.
 
         Arguments:
             doi (str): the doi of the paper.
+            crossref_metadata (Dict): the json record returned by CrossRef for this doi.
         """
-        super(PublishedWithRPF, self).from_doi(doi)
+        super(PublishedWithRPF, self).from_metadata(doi, crossref_metadata)
         self.rpf = generate_rpf_link(self.journal, doi)
 
 
@@ -74,16 +132,28 @@ class Traxiv:
     def __init__(self, group_name: str):
         self.group_name = group_name
         self.groupid = get_groupid(self.group_name, document_uri="https://www.biorxiv.org") # important to add uri to retrieve public groups!
+        self.permissions = None
         if self.groupid:
             logger.info(f"Group {self.group_name} has groupid {self.groupid}")
+            # identical for every post in this group, so built once here rather than per post() call
+            self.permissions = HYPO.helpers.permissions(
+                read=[f'group:{self.groupid}'],
+                update=[f'acct:{HYPOTHESIS_USER}@hypothes.is'],
+                delete=[f'acct:{HYPOTHESIS_USER}@hypothes.is'],
+                admin=[f'acct:{HYPOTHESIS_USER}@hypothes.is']
+            )
         else:
             logger.error(f"Could not find groupid for group: {group_name}")
             logger.error(f"Nothing can be posted.")
 
 
-    def retrieve_preprints(self, prefixes: List, start_date: str, end_date: str) -> List[Preprint]:
+    def retrieve_preprints(self, prefixes: List, start_date: str, end_date: str) -> Iterator[Preprint]:
         """
-        Rerieves the list of preprint corrsponding to multiple publishers.
+        Rerieves the preprints corrsponding to multiple publishers.
+        The scans of the different publishers are independent bioRxiv queries, so they run in
+        parallel threads; within each prefix the cursor pages are already fetched concurrently.
+        Preprints are yielded as each scan completes instead of materializing the whole corpus,
+        so downstream consumers can filter and release them one by one.
 
         Arguments:
             prefixes (List): the list of doi prefixes that identify the publishers of interest.
@@ -91,80 +161,139 @@ class Traxiv:
             end_date (str): the end date of the time range to be considered (format YYYY-MM-DD)
         """
 
-        preprints: List[Preprint] = []
-        for prefix in prefixes:
-            retrieved = retrieve(prefix, start_date, end_date)
-            logger.info(f'Found {len(retrieved)} preprints from {prefix}.')
-            preprints += retrieved
-        return preprints
-
-    def generate(self, preprints: List[Preprint], journals: List[str]) -> List[Dict[HypoPostRPF, Target]]:
+        # the same preprint can surface under several prefixes; every duplicate would pay the
+        # full existence/CrossRef/resolve cost downstream, so deduplicate by biorxiv doi here
+        seen = set()
+        duplicates = 0
+        with ThreadPoolExecutor(max_workers=max(len(prefixes), 1)) as executor:
+            for prefix, retrieved in zip(prefixes, executor.map(lambda prefix: retrieve(prefix, start_date, end_date), prefixes)):
+                logger.info(f'Found {len(retrieved)} preprints from {prefix}.')
+                for prepr in retrieved:
+                    if prepr.biorxiv_doi in seen:
+                        duplicates += 1
+                    else:
+                        seen.add(prepr.biorxiv_doi)
+                        yield prepr
+        if duplicates:
+            logger.info(f'Suppressed {duplicates} duplicate preprints across prefixes.')
+
+    def generate(self, preprints: Iterable[Preprint], journals: List[str]) -> List[Dict[HypoPostRPF, Target]]:
         """
-        Prepares hypothes.is posts from a list of preprints.
+        Prepares hypothes.is posts from preprints.
         Only preprints that were not yet posted are processed.
         Only preprints that were ultimately published in the provided list of journals are kept.
         This is useful since the bioRxiv allows only to select by publisher, which may publish many journals.
+        The CrossRef and doi.org lookups for each preprint are independent, so they are run concurrently.
 
         Arguments:
-            preprints (List[Preprints]): list of preprints to process.
+            preprints (Iterable[Preprint]): the preprints to process; may be a generator, which is
+                consumed lazily so that rejected preprints can be garbage collected immediately.
             journals (List): the name of the journals of interest.
         """
 
-        N = len(preprints)
+        return asyncio.run(self._generate_async(preprints, journals))
+
+    async def _generate_async(self, preprints: Iterable[Preprint], journals: List[str]) -> List[Dict[HypoPostRPF, Target]]:
+        journals = frozenset(journals)  # membership is tested several times per preprint
         not_generated = []
         posts = []
-        for i, prepr in enumerate(preprints):
-            progress(i, N, f"{prepr.biorxiv_doi}          ")
-            pre_existing = exists(self.groupid, prepr.biorxiv_doi)
+        # cheap pre-filters first: reject papers whose doi already rules out the journals of
+        # interest (free), then skip preprints that were already posted (one paginated search
+        # over the group instead of one hypothes.is round-trip per preprint)
+        candidates = []
+        for prepr in preprints:
+            hint = journal_hint(prepr.published_doi)
+            if hint and hint not in journals:
+                not_generated.append({'doi': prepr.biorxiv_doi, 'reason': f"journal hint '{hint}' not in journals"})
+                continue
+            candidates.append(prepr)
+        already_posted = exists_many(self.groupid, [prepr.biorxiv_doi for prepr in candidates]) if candidates else set()
+        pending = []
+        for prepr in candidates:
+            if already_posted is not None:
+                pre_existing = prepr.biorxiv_doi in already_posted
+            else:  # the batched search failed; fall back to one request per preprint
+                pre_existing = exists(self.groupid, prepr.biorxiv_doi)
             if not pre_existing and pre_existing is not None:
+                pending.append(prepr)
+            else:
+                not_generated.append({'doi': prepr.biorxiv_doi, 'reason': f'pre_existing={pre_existing}'})
+        N = len(pending)
+        sem = asyncio.Semaphore(20)
+        done = 0
+        loop = asyncio.get_event_loop()
+        # one batched CrossRef query covers all pending papers; the per-preprint lookup
+        # below only hits the network for dois the works endpoint did not return
+        crossref_records = info_batch([prepr.published_doi for prepr in pending])
+
+        async def process(session: aiohttp.ClientSession, prepr: Preprint):
+            nonlocal done
+            async with sem:
                 paper_doi = prepr.published_doi
+                crossref_metadata = crossref_records.get(paper_doi.lower())
+                if crossref_metadata is None:
+                    crossref_metadata = await ainfo(session, paper_doi)
                 paper = PublishedWithRPF()
-                paper.from_doi(paper_doi)
+                # the rpf link probe inside from_metadata uses the pooled blocking session,
+                # so it runs in a worker thread to keep the event loop free
+                await loop.run_in_executor(None, paper.from_metadata, paper_doi, crossref_metadata)
                 if paper.rpf and paper.journal in journals:
-                    prepr.biorxiv_url = resolve(prepr.biorxiv_doi)  # relies of slow webservice, so we do it only when necessary
+                    prepr.biorxiv_url = await aresolve(session, prepr.biorxiv_doi)
                     hypo_post = HypoPostRPF()
-                    hypo_post.generate(prepr, paper, embo_press_template)
+                    hypo_post.generate(prepr, paper, embo_press_format)
                     target = Target(prepr.biorxiv_url, prepr.biorxiv_doi, prepr.preprint_title)
                     posts.append({'annotation': hypo_post, 'target': target})
                 else:
                     not_generated.append({'doi': prepr.biorxiv_doi, 'reason': f"{'rpf issue' if not paper.rpf else ''} {'not in journals' if not paper.journal in journals else ''}"})
-            else:
-                not_generated.append({'doi': prepr.biorxiv_doi, 'reason': f'pre_existing={pre_existing}'})
+            done += 1
+            progress(done - 1, N, f"{prepr.biorxiv_doi}          ")
+
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=20)) as session:
+            await asyncio.gather(*[process(session, prepr) for prepr in pending])
+
         if not_generated:
             logger.info(f"{len(not_generated)} records were NOT generated:")
             for x in not_generated:
                 logger.info(f"{x}")
         return posts
 
+    # hypothes.is tolerates concurrent posting as long as the overall rate stays reasonable
+    POST_WORKERS = 5
+    MIN_POST_INTERVAL = 0.1  # seconds between posts, ie at most 10 posts/s across all workers
+
     def post(self, groupid: str, posts:  List[Dict[HypoPostRPF, Target]]) -> int:
         """
         Posts the posts (!) on hypothesis in the specified group.
+        The posts are issued from a bounded thread pool; a shared token-bucket pacer guarantees the
+        posting rate instead of the previous unconditional sleep per post, which added 100 ms even
+        when the request itself had already taken longer than that.
 
         Arguments:
             groupid (str): id of the group where the posts should be posted
             postss (List[Dict[HypoPostRPF, Target]]): the list of annotations with their targets
         """
 
-        permissions = HYPO.helpers.permissions(
-            read=[f'group:{groupid}'],
-            update=[f'acct:{HYPOTHESIS_USER}@hypothes.is'],
-            delete=[f'acct:{HYPOTHESIS_USER}@hypothes.is'],
-            admin=[f'acct:{HYPOTHESIS_USER}@hypothes.is']
-        )
+        permissions = self.permissions
         posted = 0
         N = len(posts)
-        for i, post in enumerate(posts):
-            annotation = post['annotation']
-            target = post['target']
-            progress(i, N, f"{target.doi}           ")
-            response = post_one(permissions, groupid, target, annotation)
-            if response.status_code == 200:
-                hyp_id = response.json()['id']
-                posted += 1
-            else:
-                hyp_id = ''
-                logger.info(response.text)
-            time.sleep(0.1)
+        pace_lock = threading.Lock()
+        last_request = [0.0]
+
+        def post_paced(post):
+            with pace_lock:  # only sleeps when the bucket is empty, ie when posts come back faster than the rate
+                dt = time.monotonic() - last_request[0]
+                if dt < self.MIN_POST_INTERVAL:
+                    time.sleep(self.MIN_POST_INTERVAL - dt)
+                last_request[0] = time.monotonic()
+            return post_one(permissions, groupid, post['target'], post['annotation'])
+
+        with ThreadPoolExecutor(max_workers=self.POST_WORKERS) as executor:
+            for i, (post, response) in enumerate(zip(posts, executor.map(post_paced, posts))):
+                progress(i, N, post['target'].doi + "           ")
+                if response.status_code == 200:
+                    posted += 1
+                else:
+                    logger.info(response.text)
         return posted
 
     def post_all(self, prefixes: List[str], journals: List[str], start_date: str, end_date: str):
@@ -2,18 +2,29 @@
 A few simple utility fuctions.
 """
 
+import functools
+import sys
+import aiohttp
 import requests
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
+from requests_cache import CachedSession
 from urllib3.exceptions import MaxRetryError
-from typing import Dict
-from . import HYPO, logger
+from pathlib import Path
+from typing import Dict, List
+from . import logger
 
 DOI_ORG = "https://doi.org"
+CROSSREF_WORKS_API = "https://api.crossref.org/works"
+
+_cache_dir = Path('./cache')
+if not _cache_dir.exists():
+    _cache_dir.mkdir()
+
 
 class RetrySession:
-    def __init__(self):
-        self.retry = self.requests_retry_session()
+    def __init__(self, session=None):
+        self.retry = self.requests_retry_session(session=session)
         self.retry.headers.update({"From": "thomas.lemberger@embo.org"})  # being polite?
 
     @staticmethod
@@ -22,6 +33,8 @@ class RetrySession:
         backoff_factor=0.3,
         status_forcelist=(500, 502, 504),
         session=None,
+        pool_connections=10,
+        pool_maxsize=10,
     ):
         # from  https://www.peterbe.com/plog/best-practice-with-retries-with-requests
         session = session or requests.Session()
@@ -32,17 +45,30 @@ class RetrySession:
             backoff_factor=backoff_factor,
             status_forcelist=status_forcelist,
         )
-        adapter = HTTPAdapter(max_retries=retry)
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
         session.mount('http://', adapter)
         session.mount('https://', adapter)
         return session
 
 
+# a single retry-enabled session for doi.org/CrossRef lookups, backed by a disk cache so that
+# dois already resolved on a previous run never touch the network again; the pool is sized for
+# the threaded/concurrent callers so keep-alive sockets are reused instead of re-doing TLS per doi
+_DOI_SESSION = RetrySession.requests_retry_session(
+    session=CachedSession(str(_cache_dir / 'crossref'), backend='sqlite', expire_after=30*86400),
+    pool_connections=20,
+    pool_maxsize=20,
+)
+_DOI_SESSION.headers.update({"From": "thomas.lemberger@embo.org"})  # being polite?
+
+
+@functools.lru_cache(maxsize=32)
 def get_groupid(group_name: str, document_uri: str='') -> str:
     """
     Find the hypothes.is identifier for a group with a given name.
     If several groups have the same name, the id of the first group returned by the hypothes.is API is returned.
     To retreive a public group, a document uri should be provided that is within the scope of the group.
+    The name-to-id mapping is stable, so the result is memoized per process.
 
     Arguments:
         group_name: the name of the group.
@@ -52,22 +78,25 @@ def get_groupid(group_name: str, document_uri: str='') -> str:
         str: the group id
     """
 
+    from . import HYPO  # deferred so that importing utils does not require hypothes.is credentials
+
     groupid = ''
     if group_name == '__world__':
         groupid = '__world__'
     else:
         group_list = HYPO.groups.get_list().json() # this gets only private groups but NOT the public groups
         group_list += HYPO.groups.get_list(document_uri=document_uri).json() # to retrieve public restricted groups, a url within the scope of the group should be provided
-        for g in group_list:
-            if g['name'] == group_name:
-                groupid = g['id']
-                break
+        # reversed so that, as with the previous linear scan, the first occurrence of a name wins
+        groupids = {g['name']: g['id'] for g in reversed(group_list)}
+        groupid = groupids.get(group_name, '')
     return groupid
 
 
+@functools.lru_cache(maxsize=4096)
 def resolve(doi:str) -> str:
     """
     Resolves a doi using doi.org
+    Results are memoized per doi since the same doi is often resolved several times per run.
 
     Arguments:
         doi (str): the...doi.
@@ -75,17 +104,23 @@ def resolve(doi:str) -> str:
     Returns:
         str: the url to which the doi resolves to.
     """
-    response = RetrySession().retry.get(f"{DOI_ORG}/{doi}")
-    if response.status_code:
+    # HEAD follows the redirect chain without downloading the target page, which can be
+    # hundreds of KB from publisher sites; only response.url is needed
+    response = _DOI_SESSION.head(f"{DOI_ORG}/{doi}", allow_redirects=True, timeout=10)
+    if response.status_code == 405:  # the rare publisher that rejects HEAD
+        response = _DOI_SESSION.get(f"{DOI_ORG}/{doi}", timeout=10)
+    if response.status_code < 400:
         link = response.url
     else:
         link = ''
     return link
 
 
+@functools.lru_cache(maxsize=4096)
 def info(doi: str) -> Dict:
     """
     Retreives some metadat from CrossRef for a paper.
+    Results are memoized per doi and the underlying responses are cached on disk across runs.
 
     Arguments:
         doi (str): the doi of the paper.
@@ -94,16 +129,15 @@ def info(doi: str) -> Dict:
         Dict: the full json response returned by CrossRef.
     """
     headers = {"Accept": "application/json"}
-    retry_session = RetrySession()
     try:
         url = f"{DOI_ORG}/{doi}"
-        response = retry_session.retry.get(url, headers=headers)
+        response = _DOI_SESSION.get(url, headers=headers)
     except MaxRetryError:
         logger.error(f"problem with respone to url: {url}")
         logger.info("waiting for 10 (yes, ten!) minutes.")
         sleep(10 * 60) # loooong wait before the last chance
         logger.info("trying again...wish us luck!")
-        response = retry_session.retry.get(f"{DOI_ORG}/{doi}", headers=headers)
+        response = _DOI_SESSION.get(f"{DOI_ORG}/{doi}", headers=headers)
 
     if response.status_code == 200:
         crossref_json =  response.json()
@@ -112,9 +146,87 @@ def info(doi: str) -> Dict:
     return crossref_json
 
 
+def info_batch(dois: List[str]) -> Dict[str, Dict]:
+    """
+    Retreives CrossRef metadata for many papers in one go.
+    The works endpoint accepts a multi-doi filter, so one request covers a whole chunk of dois
+    instead of one round-trip per paper.
+
+    Arguments:
+        dois (List[str]): the dois of the papers.
+
+    Returns:
+        Dict: maps each doi (lowercased, as returned by CrossRef) to its CrossRef record.
+    """
+
+    records = {}
+    chunk_size = 50
+    for i in range(0, len(dois), chunk_size):
+        chunk = [doi for doi in dois[i:i + chunk_size] if doi]
+        if not chunk:
+            continue
+        params = {"filter": "doi:" + ",doi:".join(chunk), "rows": 1000}
+        response = _DOI_SESSION.get(CROSSREF_WORKS_API, params=params)
+        if response.status_code != 200:
+            logger.error(f"⚠️ Problem with CrossRef api, status_code={response.status_code}")
+            continue
+        for item in response.json()['message']['items']:
+            records[item.get('DOI', '').lower()] = item
+    return records
+
+
+async def aresolve(session: aiohttp.ClientSession, doi: str) -> str:
+    """
+    Async counterpart of resolve(), for callers that resolve many dois concurrently.
+
+    Arguments:
+        session (aiohttp.ClientSession): the shared client session.
+        doi (str): the...doi.
+
+    Returns:
+        str: the url to which the doi resolves to.
+    """
+    async with session.head(f"{DOI_ORG}/{doi}", allow_redirects=True) as response:
+        if response.status == 405:  # the rare publisher that rejects HEAD
+            pass
+        elif response.status < 400:
+            return str(response.url)
+        else:
+            return ''
+    async with session.get(f"{DOI_ORG}/{doi}") as response:
+        if response.status < 400:
+            return str(response.url)
+    return ''
+
+
+async def ainfo(session: aiohttp.ClientSession, doi: str) -> Dict:
+    """
+    Async counterpart of info(), for callers that query CrossRef for many dois concurrently.
+
+    Arguments:
+        session (aiohttp.ClientSession): the shared client session.
+        doi (str): the doi of the paper.
+
+    Returns:
+        Dict: the full json response returned by CrossRef.
+    """
+    headers = {"Accept": "application/json"}
+    async with session.get(f"{DOI_ORG}/{doi}", headers=headers) as response:
+        if response.status == 200:
+            return await response.json(content_type=None)  # doi.org negotiation does not always label the content type cleanly
+    return {}
+
+
+_BAR_LEN = 60
+_BAR_FULL = '█' * _BAR_LEN
+_BAR_EMPTY = '-' * _BAR_LEN
+
+
 def progress(count: int, total: int, status: str=''):
     """
     A progress bar.
+    The bar is only re-rendered when it actually advances, so calling it on every iteration of a
+    large loop does not pay a string build and a flushed terminal write per item.
 
     Arguments:
         count (int): the current progress counter.
@@ -143,10 +255,13 @@ def progress(count: int, total: int, status: str=''):
     # OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
     if count == 0:
         print()
-    bar_len = 60
-    filled_len = int(round(bar_len * (count+1) / float(total)))
+        progress._last = None
+    filled_len = int(round(_BAR_LEN * (count+1) / float(total)))
     percents = round(100.0 * (count+1) / float(total))
-    bar = '█' * filled_len + '-' * (bar_len - filled_len)
-    print('\r[%s] %s%s ...%s' % (bar, percents, '%', status), end="\r", flush=True)
+    if (filled_len, percents) != getattr(progress, '_last', None):
+        bar = _BAR_FULL[:filled_len] + _BAR_EMPTY[:_BAR_LEN - filled_len]
+        sys.stdout.write('\r[%s] %s%s ...%s' % (bar, percents, '%', status))
+        sys.stdout.flush()
+        progress._last = (filled_len, percents)
     if count == total-1:
         print("\n")